@@ -1,43 +1,315 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import yfinance as yf
+import asyncio
+import json
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'market_data')
+
+# Data sources share one method, fetch(symbol, start_date, end_date), which
+# returns an OHLCV DataFrame indexed by date for [start_date, end_date).
+
+class YahooDataSource:
+    def fetch(self, symbol, start_date, end_date):
+        import yfinance as yf
+
+        data = yf.download(symbol, start=start_date, end=end_date, progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        return data
+
+class CSVDataSource:
+    # File-backed stand-in for tests and offline runs: one <symbol>.csv per
+    # symbol in `directory`, with a date index and OHLCV columns.
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, symbol, start_date, end_date):
+        data = pd.read_csv(os.path.join(self.directory, f"{symbol}.csv"), index_col=0, parse_dates=True)
+        return data[(data.index >= pd.Timestamp(start_date)) & (data.index < pd.Timestamp(end_date))]
+
+def missing_ranges(coverage, start, end):
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(coverage):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class CachedDataSource:
+    # Columnar on-disk cache in front of another source. Each symbol has one
+    # .npy file per column plus the date ranges already requested, so only
+    # uncovered gaps go to the wrapped source and reads are memory-mapped.
+    def __init__(self, source, cache_dir=DEFAULT_CACHE_DIR):
+        self.source = source
+        self.cache_dir = cache_dir
+
+    def symbol_dir(self, symbol):
+        return os.path.join(self.cache_dir, symbol)
+
+    def load_coverage(self, symbol):
+        path = os.path.join(self.symbol_dir(symbol), 'coverage.json')
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r') as f:
+            return [(np.datetime64(start, 'D'), np.datetime64(end, 'D')) for start, end in json.load(f)]
+
+    def save_array(self, symbol, name, values):
+        path = os.path.join(self.symbol_dir(symbol), f"{name}.npy")
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, values)
+        os.replace(path + '.tmp', path)
+
+    def load_frame(self, symbol, mmap_mode=None):
+        directory = self.symbol_dir(symbol)
+        if not os.path.exists(os.path.join(directory, 'index.npy')):
+            return np.array([], dtype='datetime64[ns]'), {column: np.array([]) for column in OHLCV_COLUMNS}
+        index = np.load(os.path.join(directory, 'index.npy'), mmap_mode=mmap_mode)
+        columns = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode=mmap_mode) for column in OHLCV_COLUMNS}
+        return index, columns
+
+    def store(self, symbol, frames, coverage):
+        os.makedirs(self.symbol_dir(symbol), exist_ok=True)
+        index, columns = self.load_frame(symbol)
+        indexes = [index] + [frame.index.to_numpy(dtype='datetime64[ns]') for frame in frames]
+        merged_index = np.concatenate(indexes)
+        # Newer rows win when a date was fetched twice.
+        order = np.argsort(merged_index, kind='stable')[::-1]
+        _, unique = np.unique(merged_index[order], return_index=True)
+        keep = order[unique]
+        for column in OHLCV_COLUMNS:
+            values = np.concatenate([columns[column]] + [frame[column].to_numpy(dtype=float) for frame in frames])
+            self.save_array(symbol, column, values[keep])
+        self.save_array(symbol, 'index', merged_index[keep])
+        with open(os.path.join(self.symbol_dir(symbol), 'coverage.json'), 'w') as f:
+            json.dump([(str(start), str(end)) for start, end in coverage], f)
+
+    def fetch(self, symbol, start_date, end_date):
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D')
+        coverage = self.load_coverage(symbol)
+        gaps = missing_ranges(coverage, start, end)
+        today = np.datetime64('today', 'D')
+        if gaps:
+            logging.info(f"Fetching {len(gaps)} missing range(s) for {symbol}")
+            frames = []
+            fetched = []
+            for gap_start, gap_end in gaps:
+                frame = self.source.fetch(symbol, str(gap_start), str(gap_end))
+                if frame is None or frame.empty:
+                    # yfinance returns an empty frame when rate-limited or
+                    # offline; leave the gap uncovered so it is retried.
+                    logging.warning(f"No data returned for {symbol} from {gap_start} to {gap_end}")
+                    continue
+                frames.append(frame)
+                # The source answered for the whole gap, so trailing weekends
+                # and holidays are covered too; days from today on stay open
+                # because their bars may not exist yet.
+                if gap_start < today:
+                    fetched.append((gap_start, min(gap_end, today)))
+            if frames:
+                self.store(symbol, frames, merge_ranges(coverage + fetched))
+        index, columns = self.load_frame(symbol, mmap_mode='r')
+        lo, hi = np.searchsorted(index, [start, end])
+        if lo == hi:
+            raise ValueError(f"No data returned for {symbol} from {start_date} to {end_date}")
+        data = pd.DataFrame({column: np.array(columns[column][lo:hi]) for column in OHLCV_COLUMNS},
+                            index=pd.DatetimeIndex(np.array(index[lo:hi]), name='Date'))
+        return data
+
 class DataHandler:
-    def __init__(self, symbol, start_date, end_date):
+    def __init__(self, symbol, start_date, end_date, data_source=None):
         self.symbol = symbol
         self.start_date = start_date
         self.end_date = end_date
+        self.data_source = data_source or CachedDataSource(YahooDataSource())
         self.data = None
 
     def fetch_data(self):
         logging.info(f"Fetching data for {self.symbol} from {self.start_date} to {self.end_date}")
-        self.data = yf.download(self.symbol, start=self.start_date, end=self.end_date)
-        self.data = self.data[['Open', 'High', 'Low', 'Close', 'Volume']]
-        self.data.dropna(inplace=True)
+        self.data = self.data_source.fetch(self.symbol, self.start_date, self.end_date)
+        self.data = self.data[OHLCV_COLUMNS]
+        self.data = self.data.dropna()
         logging.info("Data fetched successfully")
 
     def get_data(self):
         return self.data
 
+class PortfolioDataHandler:
+    # Loads several symbols into one aligned (dates, symbols) close array.
+    # Gaps are forward-filled and bars before a symbol listed are back-filled
+    # so every position can be valued; `listed` marks dates on which a symbol
+    # had started trading, and signals should ignore the rest.
+    def __init__(self, symbols, start_date, end_date, data_source=None):
+        self.symbols = list(symbols)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.data_source = data_source or CachedDataSource(YahooDataSource())
+        self.dates = None
+        self.close = None
+        self.listed = None
+
+    def fetch_data(self):
+        logging.info(f"Fetching data for {len(self.symbols)} symbols from {self.start_date} to {self.end_date}")
+        closes = []
+        for symbol in self.symbols:
+            data_handler = DataHandler(symbol, self.start_date, self.end_date, self.data_source)
+            data_handler.fetch_data()
+            closes.append(data_handler.get_data()['Close'].rename(symbol))
+        close = pd.concat(closes, axis=1).sort_index().ffill()
+        self.dates = close.index
+        self.listed = close.notna().to_numpy()
+        self.close = close.bfill().to_numpy(dtype=float)
+        logging.info("Data fetched successfully")
+
+    def get_data(self):
+        return pd.DataFrame(self.close, index=self.dates, columns=self.symbols)
+
+# Relative margin the short average must clear to count as above the long
+# one. Windowed sums carry rounding noise of a few ulps, which would
+# otherwise turn exact ties (flat or illiquid stretches) into crossovers.
+CROSSOVER_TOLERANCE = 1e-9
+
+def crossover_above(short_mavg, long_mavg):
+    return short_mavg - long_mavg > CROSSOVER_TOLERANCE * np.abs(long_mavg)
+
+def centered_totals(prices):
+    # Cumulative sums of the offsets from the first bar, which keeps the
+    # totals (and their rounding error) small over long histories.
+    base = prices[:1]
+    return np.cumsum(prices - base, axis=0), base
+
+def rolling_mean(prices, window):
+    # Same values as rolling(window, min_periods=1).mean() to within
+    # rounding, built from one cumulative sum along axis 0 so it works on
+    # (bars,) or (bars, symbols). NaN bars are skipped, so a symbol that
+    # lists late gets windows that start at its first price; rows before it
+    # stay NaN.
+    listed = ~np.isnan(prices)
+    base = np.take_along_axis(prices, listed.argmax(axis=0)[None], axis=0)
+    totals = np.cumsum(np.where(listed, prices - base, 0.0), axis=0)
+    counts = np.cumsum(listed, axis=0)
+    with np.errstate(invalid='ignore'):
+        return window_sums(totals, window) / window_sums(counts, window) + base
+
+def window_sums(cumulative, window):
+    sums = cumulative.astype(float)
+    sums[window:] -= cumulative[:-window]
+    return sums
+
+def rolling_mean_from_totals(totals, window):
+    means = np.empty_like(totals)
+    warmup = min(window, len(totals))
+    counts = np.arange(1, warmup + 1, dtype=float).reshape((-1,) + (1,) * (totals.ndim - 1))
+    means[:warmup] = totals[:warmup] / counts
+    means[window:] = (totals[window:] - totals[:-window]) / window
+    return means
+
+def crossover_signals(prices, short_window, long_window):
+    prices = np.asarray(prices, dtype=float)
+    short_mavg = rolling_mean(prices, short_window)
+    long_mavg = rolling_mean(prices, long_window)
+    signal = np.where(crossover_above(short_mavg, long_mavg), 1.0, 0.0)
+    # No signal until short_window bars after each column's first price.
+    signal[np.cumsum(~np.isnan(prices), axis=0) <= short_window] = 0.0
+    positions = np.empty_like(signal)
+    positions[0] = np.nan
+    positions[1:] = signal[1:] - signal[:-1]
+    return short_mavg, long_mavg, signal, positions
+
+class CrossoverIndicator:
+    # Streaming counterpart of crossover_signals for many symbols. Each
+    # moving average keeps a ring buffer of the last `window` prices and
+    # their windowed sum, updated in O(1) per bar. The sum is recomputed from
+    # the ring every time it wraps, so rounding error stays bounded in a
+    # loop that runs indefinitely.
+    def __init__(self, symbols, short_window, long_window):
+        self.symbols = list(symbols)
+        self.columns = {symbol: column for column, symbol in enumerate(self.symbols)}
+        self.short_window = short_window
+        self.long_window = long_window
+        num_symbols = len(self.symbols)
+        self.short_prices = np.zeros((short_window, num_symbols))
+        self.long_prices = np.zeros((long_window, num_symbols))
+        self.short_sums = np.zeros(num_symbols)
+        self.long_sums = np.zeros(num_symbols)
+        self.counts = np.zeros(num_symbols, dtype=np.int64)
+        self.signal = np.full(num_symbols, np.nan)
+
+    def rolling_update(self, ring, sums, window, columns, prices):
+        counts = self.counts[columns]
+        slots = counts % window
+        window_sums = sums[columns] - np.where(counts >= window, ring[slots, columns], 0.0) + prices
+        ring[slots, columns] = prices
+        wrapped = slots == window - 1
+        if wrapped.any():
+            window_sums[wrapped] = ring[:, columns[wrapped]].sum(axis=0)
+        sums[columns] = window_sums
+        return window_sums / np.minimum(counts + 1, window)
+
+    def update_columns(self, columns, prices):
+        short_mavg = self.rolling_update(self.short_prices, self.short_sums, self.short_window, columns, prices)
+        long_mavg = self.rolling_update(self.long_prices, self.long_sums, self.long_window, columns, prices)
+        signal = np.where((self.counts[columns] >= self.short_window) & crossover_above(short_mavg, long_mavg), 1.0, 0.0)
+        positions = signal - self.signal[columns]
+        self.signal[columns] = signal
+        self.counts[columns] += 1
+        return short_mavg, long_mavg, signal, positions
+
+    def update(self, prices):
+        # prices is aligned with self.symbols; NaN marks a symbol without a
+        # new bar. Returns (short_mavg, long_mavg, signal, positions), NaN
+        # for symbols that were not updated.
+        prices = np.asarray(prices, dtype=float)
+        columns = np.nonzero(~np.isnan(prices))[0]
+        results = [np.full(len(self.symbols), np.nan) for _ in range(4)]
+        for result, values in zip(results, self.update_columns(columns, prices[columns])):
+            result[columns] = values
+        return tuple(results)
+
+    def update_symbol(self, symbol, price):
+        columns = np.array([self.columns[symbol]])
+        return tuple(float(values[0]) for values in self.update_columns(columns, np.array([price], dtype=float)))
+
 class Strategy:
     def __init__(self, data):
         self.data = data
 
     def moving_average_crossover(self, short_window, long_window):
         logging.info("Starting Moving Average Crossover strategy")
-        signals = pd.DataFrame(index=self.data.index)
-        signals['price'] = self.data['Close']
-        signals['short_mavg'] = self.data['Close'].rolling(window=short_window, min_periods=1).mean()
-        signals['long_mavg'] = self.data['Close'].rolling(window=long_window, min_periods=1).mean()
-        signals['signal'] = 0.0
-        signals['signal'][short_window:] = np.where(signals['short_mavg'][short_window:] > signals['long_mavg'][short_window:], 1.0, 0.0)
-        signals['positions'] = signals['signal'].diff()
+        prices = self.data['Close'].to_numpy(dtype=float)
+        short_mavg, long_mavg, signal, positions = crossover_signals(prices, short_window, long_window)
+        signals = pd.DataFrame({
+            'price': prices,
+            'short_mavg': short_mavg,
+            'long_mavg': long_mavg,
+            'signal': signal,
+            'positions': positions,
+        }, index=self.data.index)
         logging.info("Signals generated")
         return signals
 
@@ -65,21 +337,294 @@ class Backtester:
         plt.legend()
         plt.show()
 
+class PortfolioBacktester(Backtester):
+    # Backtests a (dates, symbols) signal matrix in one vectorized pass.
+    # With position_size=None each symbol gets an equal share of the
+    # initial capital, converted to shares at the entry price and held
+    # until the signal drops; otherwise position_size is a fixed share count.
+    # commission is charged as a fraction of traded notional.
+    def __init__(self, dates, symbols, close, signal, initial_capital, commission=0.0, position_size=None):
+        self.dates = dates
+        self.symbols = list(symbols)
+        self.close = np.asarray(close, dtype=float)
+        self.signal = np.asarray(signal, dtype=float)
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.position_size = position_size
+        self.shares = None
+        self.portfolio = pd.DataFrame(index=dates)
+
+    def target_shares(self):
+        if self.position_size is not None:
+            return self.signal * self.position_size
+        rows = np.arange(len(self.signal))[:, None]
+        previous = np.vstack([np.zeros((1, self.signal.shape[1])), self.signal[:-1]])
+        entries = (self.signal > 0) & (previous == 0)
+        entry_rows = np.maximum.accumulate(np.where(entries, rows, 0), axis=0)
+        entry_price = np.take_along_axis(self.close, entry_rows, axis=0)
+        allocation = self.initial_capital / len(self.symbols)
+        return self.signal * allocation / entry_price
+
+    def backtest(self):
+        logging.info(f"Starting portfolio backtest over {len(self.symbols)} symbols")
+        self.shares = self.target_shares()
+        trades = np.diff(self.shares, axis=0, prepend=0.0)
+        traded_value = trades * self.close
+        costs = np.abs(traded_value) * self.commission
+        holdings = self.shares * self.close
+        self.portfolio['holdings'] = holdings.sum(axis=1)
+        self.portfolio['cash'] = self.initial_capital - np.cumsum((traded_value + costs).sum(axis=1))
+        self.portfolio['costs'] = np.cumsum(costs.sum(axis=1))
+        self.portfolio['total'] = self.portfolio['cash'] + self.portfolio['holdings']
+        self.portfolio['returns'] = self.portfolio['total'].pct_change()
+        logging.info("Backtest complete")
+        return self.portfolio
+
+def backtest_metrics(close, positions, initial_capital):
+    # Backtester.backtest for a (bars, combinations) matrix of positions
+    # against one close series, reduced to summary metrics per column.
+    close = close[:, None]
+    trades = np.diff(positions, axis=0, prepend=np.nan)
+    cash = initial_capital - np.nancumsum(trades * close, axis=0)
+    total = cash + positions * close
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = total[1:] / total[:-1] - 1
+        mean = np.nanmean(returns, axis=0)
+        std = np.nanstd(returns, axis=0)
+        sharpe = np.where(std > 0, mean / std * np.sqrt(252), 0.0)
+    return {
+        'final_value': total[-1],
+        'total_return': total[-1] / initial_capital - 1,
+        'sharpe': sharpe,
+        'trades': np.count_nonzero(np.nan_to_num(trades), axis=0),
+    }
+
+def sweep_symbol(symbol, close, window_pairs, initial_capital):
+    # Every distinct window's moving average comes from one cumulative sum;
+    # all window pairs are then evaluated as columns of one matrix.
+    close = np.asarray(close, dtype=float)
+    totals, base = centered_totals(close)
+    windows = sorted({window for pair in window_pairs for window in pair})
+    column = {window: index for index, window in enumerate(windows)}
+    means = np.column_stack([rolling_mean_from_totals(totals, window) for window in windows]) + base
+    shorts = np.array([short for short, _ in window_pairs])
+    longs = np.array([long for _, long in window_pairs])
+    short_mavg = means[:, [column[short] for short in shorts]]
+    long_mavg = means[:, [column[long] for long in longs]]
+    signal = np.where(crossover_above(short_mavg, long_mavg), 1.0, 0.0)
+    signal[np.arange(len(close))[:, None] < shorts] = 0.0
+    positions = np.diff(signal, axis=0, prepend=np.nan)
+    results = backtest_metrics(close, positions, initial_capital)
+    results['symbol'] = symbol
+    results['short_window'] = shorts
+    results['long_window'] = longs
+    return pd.DataFrame(results)
+
+def sweep_crossover(prices, short_windows, long_windows, initial_capital, workers=None, chunk_size=1024):
+    # prices maps symbol -> close series. Work is split into (symbol, chunk
+    # of window pairs) tasks, run on a process pool when more than one
+    # worker is available. Returns every combination ranked by total return.
+    window_pairs = [(short, long) for short in short_windows for long in long_windows if short < long]
+    tasks = [(symbol, close, window_pairs[start:start + chunk_size], initial_capital)
+             for symbol, close in prices.items()
+             for start in range(0, len(window_pairs), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    logging.info(f"Sweeping {len(window_pairs)} window pairs over {len(prices)} symbols")
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            frames = list(executor.map(sweep_symbol, *zip(*tasks)))
+    else:
+        frames = [sweep_symbol(*task) for task in tasks]
+    results = pd.concat(frames, ignore_index=True)
+    results = results[['symbol', 'short_window', 'long_window', 'final_value', 'total_return', 'sharpe', 'trades']]
+    return results.sort_values('total_return', ascending=False, ignore_index=True)
+
+def run_parameter_sweep(symbols, start_date, end_date, short_windows, long_windows, initial_capital, workers=None, data_source=None):
+    prices = {}
+    for symbol in symbols:
+        data_handler = DataHandler(symbol, start_date, end_date, data_source)
+        data_handler.fetch_data()
+        prices[symbol] = data_handler.get_data()['Close'].to_numpy(dtype=float)
+    return sweep_crossover(prices, short_windows, long_windows, initial_capital, workers)
+
+def run_portfolio_backtest(symbols, start_date, end_date, short_window, long_window, initial_capital,
+                           commission=0.0, position_size=None, data_source=None):
+    data_handler = PortfolioDataHandler(symbols, start_date, end_date, data_source)
+    data_handler.fetch_data()
+    # Bars before a symbol listed are back-filled for valuation only; the
+    # signals see them as missing.
+    prices = np.where(data_handler.listed, data_handler.close, np.nan)
+    _, _, signal, _ = crossover_signals(prices, short_window, long_window)
+    backtester = PortfolioBacktester(data_handler.dates, data_handler.symbols, data_handler.close, signal,
+                                     initial_capital, commission, position_size)
+    return backtester.backtest()
+
+class Bar:
+    def __init__(self, symbol, timestamp, open, high, low, close, volume):
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+class ReplayFeed:
+    # Bar feeds expose `async for bar in feed.stream()`. This one replays a
+    # long-format CSV (Date, Symbol and OHLCV columns) in date order, sleeping
+    # `interval` seconds between bars to mimic a live stream.
+    def __init__(self, path, interval=0.0):
+        self.path = path
+        self.interval = interval
+
+    async def stream(self):
+        data = pd.read_csv(self.path, parse_dates=['Date']).sort_values(['Date', 'Symbol'], kind='stable')
+        for row in data.itertuples(index=False):
+            yield Bar(row.Symbol, row.Date, row.Open, row.High, row.Low, row.Close, row.Volume)
+            await asyncio.sleep(self.interval)
+
+class Order:
+    def __init__(self, symbol, quantity, timestamp):
+        self.symbol = symbol
+        self.quantity = quantity
+        self.timestamp = timestamp
+
+class SimulatedBroker:
+    # Fills every market order immediately at the given price.
+    def __init__(self, initial_capital, commission=0.0):
+        self.cash = initial_capital
+        self.commission = commission
+        self.positions = {}
+        self.fills = []
+
+    def submit_order(self, order, price):
+        cost = abs(order.quantity * price) * self.commission
+        self.cash -= order.quantity * price + cost
+        self.positions[order.symbol] = self.positions.get(order.symbol, 0) + order.quantity
+        self.fills.append((order.timestamp, order.symbol, order.quantity, price, cost))
+
+    def equity(self, prices):
+        return self.cash + sum(quantity * prices[symbol] for symbol, quantity in self.positions.items())
+
+class LatencyHistogram:
+    # Power-of-two microsecond buckets: cheap to record, wide dynamic range.
+    def __init__(self, buckets=32):
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        microseconds = seconds * 1e6
+        bucket = min(int(microseconds).bit_length(), len(self.counts) - 1)
+        self.counts[bucket] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        count = self.counts.sum()
+        if count == 0:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), count * percent / 100))
+        return (2 ** bucket) / 1e6
+
+    def to_dict(self):
+        count = int(self.counts.sum())
+        return {
+            'count': count,
+            'mean_seconds': self.total / count if count else 0.0,
+            'max_seconds': self.max,
+            'p50_seconds': self.percentile(50),
+            'p99_seconds': self.percentile(99),
+            'buckets': [{'le_microseconds': 2 ** bucket, 'count': int(n)} for bucket, n in enumerate(self.counts) if n],
+        }
+
+    def export(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+class LiveTradingEngine:
+    # Event-driven runtime: the feed fills a queue, and one consumer updates
+    # the crossover state for each bar and routes orders to the broker.
+    # Latency runs from a bar's arrival on the queue to its order decision.
+    # Equity is only recorded here; plot_results runs after the loop.
+    def __init__(self, feed, symbols, short_window, long_window, broker, position_size=100, queue_size=10000):
+        self.feed = feed
+        self.indicator = CrossoverIndicator(symbols, short_window, long_window)
+        self.broker = broker
+        self.position_size = position_size
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.latency = LatencyHistogram()
+        self.prices = {}
+        self.equity_curve = []
+        self.unknown_symbols = set()
+
+    async def produce(self):
+        async for bar in self.feed.stream():
+            await self.queue.put((time.perf_counter(), bar))
+        await self.queue.put(None)
+
+    def on_bar(self, bar):
+        # Bars for symbols the engine wasn't configured with are skipped,
+        # with one warning per symbol, rather than stopping the consumer.
+        if bar.symbol not in self.indicator.columns:
+            if bar.symbol not in self.unknown_symbols:
+                self.unknown_symbols.add(bar.symbol)
+                logging.warning(f"Skipping bars for unknown symbol {bar.symbol}")
+            return
+        _, _, signal, _ = self.indicator.update_symbol(bar.symbol, bar.close)
+        self.prices[bar.symbol] = bar.close
+        quantity = signal * self.position_size - self.broker.positions.get(bar.symbol, 0)
+        if quantity:
+            self.broker.submit_order(Order(bar.symbol, quantity, bar.timestamp), bar.close)
+
+    async def consume(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            arrived, bar = item
+            self.on_bar(bar)
+            self.latency.record(time.perf_counter() - arrived)
+            self.equity_curve.append((bar.timestamp, self.broker.equity(self.prices)))
+
+    async def run(self):
+        await asyncio.gather(self.produce(), self.consume())
+        logging.info(f"Processed {int(self.latency.counts.sum())} bars, p99 latency {self.latency.percentile(99) * 1e6:.0f}us")
+        return self.latency
+
+    def plot_results(self):
+        timestamps, equity = zip(*self.equity_curve)
+        plt.figure(figsize=(12, 8))
+        plt.plot(timestamps, equity, label='Equity')
+        plt.title('Live Trading Equity')
+        plt.legend()
+        plt.show()
+
+def run_live_replay(path, symbols, short_window, long_window, initial_capital, latency_path=None, interval=0.0):
+    broker = SimulatedBroker(initial_capital)
+    engine = LiveTradingEngine(ReplayFeed(path, interval), symbols, short_window, long_window, broker)
+    latency = asyncio.run(engine.run())
+    if latency_path:
+        latency.export(latency_path)
+    return engine
+
 class TradingBot:
-    def __init__(self, symbol, start_date, end_date, short_window, long_window, initial_capital):
+    def __init__(self, symbol, start_date, end_date, short_window, long_window, initial_capital, data_source=None):
         logging.info("Initializing Trading Bot")
-        self.data_handler = DataHandler(symbol, start_date, end_date)
+        self.data_handler = DataHandler(symbol, start_date, end_date, data_source)
         self.data_handler.fetch_data()
         self.data = self.data_handler.get_data()
         self.strategy = Strategy(self.data)
         self.signals = self.strategy.moving_average_crossover(short_window, long_window)
-        self.backtester = Backtester(self.signals, initial_capital)
+        self.backtester = Backtester(self.strategy, initial_capital)
         self.positions = self.signals['positions']
 
-    def run_backtest(self):
+    def run_backtest(self, plot=True):
         self.backtester.positions = self.positions
         portfolio = self.backtester.backtest()
-        self.backtester.plot_results()
+        if plot:
+            self.backtester.plot_results()
+        return portfolio
 
 if __name__ == "__main__":
     symbol = 'AAPL'
@@ -0,0 +1,64 @@
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+from encryption_decryption import EncryptionDecryption
+
+def time_call(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def rates(name, workers, num_records, record_size, seconds):
+    return {
+        'path': name,
+        'workers': workers,
+        'records': num_records,
+        'record_bytes': record_size,
+        'seconds': seconds,
+        'records_per_second': num_records / seconds,
+        'mb_per_second': num_records * record_size / seconds / 1e6,
+    }
+
+def benchmark(num_records, record_size, workers_list, chunk_size, iterations):
+    codec = EncryptionDecryption('benchmark', iterations=iterations)
+    records = [os.urandom(record_size) for _ in range(num_records)]
+    texts = [base64.b64encode(record).decode('ascii') for record in records]
+    results = []
+
+    encrypted = []
+    seconds = time_call(lambda: encrypted.extend(codec.encrypt(text) for text in texts))
+    results.append(rates('encrypt', 1, num_records, record_size, seconds))
+    seconds = time_call(lambda: [codec.decrypt(text) for text in encrypted])
+    results.append(rates('decrypt', 1, num_records, record_size, seconds))
+
+    for workers in workers_list:
+        sealed = []
+        seconds = time_call(lambda: sealed.extend(codec.encrypt_many(records, workers, chunk_size)))
+        results.append(rates('encrypt_many', workers, num_records, record_size, seconds))
+        opened = []
+        seconds = time_call(lambda: opened.extend(codec.decrypt_many(sealed, workers, chunk_size)))
+        results.append(rates('decrypt_many', workers, num_records, record_size, seconds))
+        if opened != records:
+            raise RuntimeError(f"decrypt_many with {workers} workers did not round-trip")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare one-at-a-time and bulk record encryption throughput.")
+    parser.add_argument('--records', default=100000, type=int)
+    parser.add_argument('--record-size', default=64, type=int, help="Plaintext bytes per record")
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated pool sizes for the bulk path")
+    parser.add_argument('--chunk-size', default=1024, type=int)
+    parser.add_argument('--iterations', default=100_000, type=int, help="PBKDF2 iterations")
+    args = parser.parse_args(argv)
+
+    workers_list = [int(workers) for workers in args.workers.split(',') if workers]
+    results = benchmark(args.records, args.record_size, workers_list, args.chunk_size, args.iterations)
+    json.dump({'cpu_count': os.cpu_count(), 'results': results}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from quantum_computing_simulation import (
+    CNOTGate,
+    HadamardGate,
+    PauliXGate,
+    PauliYGate,
+    PauliZGate,
+    QuantumCircuit,
+    random_circuit,
+)
+
+GATE_MIXES = {
+    'clifford': lambda: [HadamardGate(), PauliXGate(), PauliYGate(), PauliZGate(), CNOTGate()],
+    'real': lambda: [HadamardGate(), PauliXGate(), PauliZGate(), CNOTGate()],
+    'single': lambda: [HadamardGate(), PauliXGate(), PauliYGate(), PauliZGate()],
+}
+
+def peak_rss_bytes():
+    # ru_maxrss is the peak for the whole process so far, in KiB on Linux
+    # and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def time_call(function, warmup, repetitions):
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def benchmark_case(num_qubits, depth, mix, shots, workers, dtype, warmup, repetitions):
+    template = random_circuit(num_qubits, depth, GATE_MIXES[mix](), dtype=dtype)
+    circuit = None
+
+    def execute():
+        nonlocal circuit
+        if circuit is not None:
+            circuit.close()
+        circuit = QuantumCircuit(num_qubits, workers, dtype=dtype)
+        circuit.gates = list(template.gates)
+        circuit.execute()
+
+    gate_timings = time_call(execute, warmup, repetitions)
+    shot_timings = time_call(lambda: np.bincount(circuit.sample(shots), minlength=2**num_qubits), warmup, repetitions)
+    circuit.close()
+    gate_seconds = statistics.median(gate_timings)
+    shot_seconds = statistics.median(shot_timings)
+    return {
+        'qubits': num_qubits,
+        'depth': depth,
+        'gate_mix': mix,
+        'shots': shots,
+        'workers': workers,
+        'dtype': np.dtype(dtype).name,
+        'execute_seconds': gate_seconds,
+        'execute_seconds_min': min(gate_timings),
+        'sample_seconds': shot_seconds,
+        'gates_per_second': depth / gate_seconds,
+        'shots_per_second': shots / shot_seconds,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+def parse_list(value, convert=int):
+    return [convert(item) for item in value.split(',') if item]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the statevector simulator and report throughput as JSON.")
+    parser.add_argument('--qubits', default='4,8,12,16,20', type=parse_list)
+    parser.add_argument('--depths', default='100', type=parse_list)
+    parser.add_argument('--gate-mixes', default='clifford', type=lambda value: parse_list(value, str))
+    parser.add_argument('--shots', default='1000000', type=parse_list)
+    parser.add_argument('--workers', default='1', type=parse_list)
+    parser.add_argument('--dtype', default='complex128')
+    parser.add_argument('--warmup', default=1, type=int)
+    parser.add_argument('--repetitions', default=5, type=int)
+    parser.add_argument('--seed', default=0, type=int)
+    parser.add_argument('--output', help="Write results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    np.random.seed(args.seed)
+    results = []
+    for num_qubits in args.qubits:
+        for depth in args.depths:
+            for mix in args.gate_mixes:
+                for shots in args.shots:
+                    for workers in args.workers:
+                        results.append(benchmark_case(num_qubits, depth, mix, shots, workers,
+                                                      np.dtype(args.dtype), args.warmup, args.repetitions))
+
+    report = {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from distributed_system import Coordinator, FIFOScheduler, Task, WorkStealingScheduler
+
+SCHEDULERS = {
+    'fifo': FIFOScheduler,
+    'work_stealing': WorkStealingScheduler,
+}
+
+def uniform_mix(num_tasks, rng):
+    return [rng.randint(1, 5) for _ in range(num_tasks)]
+
+def pareto_mix(num_tasks, rng):
+    return [min(rng.paretovariate(1.2), 100.0) for _ in range(num_tasks)]
+
+def tail_heavy_mix(num_tasks, rng):
+    # Mostly short tasks with a few long ones submitted last: the worst case
+    # for first-in-first-out dispatch.
+    long_tasks = max(1, num_tasks // 20)
+    return [1.0] * (num_tasks - long_tasks) + [40.0] * long_tasks
+
+TASK_MIXES = {
+    'uniform': uniform_mix,
+    'pareto': pareto_mix,
+    'tail_heavy': tail_heavy_mix,
+}
+
+def benchmark_case(scheduler_name, mix, num_workers, num_tasks, time_scale, seed):
+    rng = random.Random(seed)
+    tasks = [Task(i, complexity) for i, complexity in enumerate(TASK_MIXES[mix](num_tasks, rng))]
+    total_work = sum(task.complexity for task in tasks) * time_scale
+    coordinator = Coordinator(num_workers, SCHEDULERS[scheduler_name](num_workers), time_scale)
+    start = time.perf_counter()
+    coordinator.assign_tasks(tasks)
+    coordinator.wait_for_completion()
+    makespan = time.perf_counter() - start
+    coordinator.stop_workers()
+    return {
+        'scheduler': scheduler_name,
+        'task_mix': mix,
+        'workers': num_workers,
+        'tasks': num_tasks,
+        'makespan_seconds': makespan,
+        'ideal_makespan_seconds': max(total_work / num_workers, max(task.complexity for task in tasks) * time_scale),
+        'tasks_per_second': num_tasks / makespan,
+    }
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def telemetry_overhead(num_workers, num_tasks, task_micros, repetitions):
+    # Zero-work tasks isolate the per-task bookkeeping, so task_micros=0 is
+    # the worst case for the relative cost of telemetry.
+    timings = {False: [], True: []}
+    for _ in range(repetitions):
+        for telemetry in (False, True):
+            coordinator = Coordinator(num_workers, telemetry=telemetry)
+            tasks = [Task(i, 0, function=spin, args=(task_micros / 1e6,)) for i in range(num_tasks)]
+            start = time.perf_counter()
+            coordinator.assign_tasks(tasks)
+            coordinator.wait_for_completion()
+            timings[telemetry].append(time.perf_counter() - start)
+            coordinator.stop_workers()
+    baseline = statistics.median(timings[False])
+    measured = statistics.median(timings[True])
+    return {
+        'workers': num_workers,
+        'tasks': num_tasks,
+        'task_micros': task_micros,
+        'repetitions': repetitions,
+        'seconds_without_telemetry': baseline,
+        'seconds_with_telemetry': measured,
+        'overhead_percent': (measured - baseline) / baseline * 100,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare coordinator schedulers on skewed task mixes.")
+    parser.add_argument('--workers', default=4, type=int)
+    parser.add_argument('--tasks', default=200, type=int)
+    parser.add_argument('--time-scale', default=0.001, type=float, help="Seconds of sleep per unit of complexity")
+    parser.add_argument('--mixes', default='uniform,pareto,tail_heavy')
+    parser.add_argument('--seed', default=0, type=int)
+    parser.add_argument('--overhead', action='store_true', help="Measure telemetry overhead on no-op tasks instead")
+    parser.add_argument('--task-micros', default='0,100', help="Busy-wait per task in overhead mode")
+    parser.add_argument('--repetitions', default=5, type=int)
+    args = parser.parse_args(argv)
+
+    if args.overhead:
+        results = [telemetry_overhead(args.workers, args.tasks, float(micros), args.repetitions)
+                   for micros in args.task_micros.split(',')]
+        json.dump({'results': results}, sys.stdout, indent=2)
+        print()
+        return
+
+    results = []
+    for mix in args.mixes.split(','):
+        for scheduler_name in SCHEDULERS:
+            results.append(benchmark_case(scheduler_name, mix, args.workers, args.tasks, args.time_scale, args.seed))
+    json.dump({'results': results}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
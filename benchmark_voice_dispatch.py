@@ -0,0 +1,69 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from voice_assistant import CommandDispatcher
+
+VOCABULARY = [
+    "open", "close", "play", "stop", "show", "tell", "set", "turn", "what", "is", "the", "my", "a", "me",
+    "music", "weather", "time", "alarm", "lights", "volume", "news", "joke", "timer", "calendar", "email",
+    "kitchen", "bedroom", "living", "room", "today", "tomorrow", "up", "down", "on", "off", "next", "song",
+]
+
+def make_phrases(count, rng):
+    phrases = set()
+    while len(phrases) < count:
+        phrases.add(' '.join(rng.choices(VOCABULARY, k=rng.randint(2, 5))))
+    return sorted(phrases)
+
+def substring_dispatch(commands, utterance):
+    # The previous execute_command loop, for comparison.
+    for key in commands.keys():
+        if key in utterance:
+            return key
+    return None
+
+def time_lookups(function, utterances, repetitions):
+    best = float('inf')
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        for utterance in utterances:
+            function(utterance)
+        best = min(best, time.perf_counter() - start)
+    return best / len(utterances)
+
+def benchmark_case(num_commands, num_utterances, repetitions, rng):
+    phrases = make_phrases(num_commands, rng)
+    commands = {phrase: None for phrase in phrases}
+    utterances = [' '.join(rng.choices(VOCABULARY, k=rng.randint(4, 12))) for _ in range(num_utterances)]
+    dispatcher = CommandDispatcher(commands)
+    start = time.perf_counter()
+    dispatcher.build()
+    build_seconds = time.perf_counter() - start
+    return {
+        'commands': num_commands,
+        'utterances': num_utterances,
+        'build_seconds': build_seconds,
+        'automaton_microseconds_per_lookup': time_lookups(dispatcher.match, utterances, repetitions) * 1e6,
+        'substring_microseconds_per_lookup': time_lookups(lambda utterance: substring_dispatch(commands, utterance),
+                                                          utterances, repetitions) * 1e6,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare command lookup cost as the command set grows.")
+    parser.add_argument('--commands', default='10,100,1000,10000')
+    parser.add_argument('--utterances', default=2000, type=int)
+    parser.add_argument('--repetitions', default=3, type=int)
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = [benchmark_case(int(count), args.utterances, args.repetitions, rng)
+               for count in args.commands.split(',') if count]
+    json.dump({'results': results}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,340 @@
 import os
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from Crypto.Cipher import AES
+from Crypto.Hash import SHA1, SHA256, SHA512
 from Crypto.Random import get_random_bytes
 from Crypto.Protocol.KDF import PBKDF2
 import base64
+import io
+import itertools
 import json
+import struct
+
+# Envelopes carry their KDF parameters: a versioned magic, a hash id byte
+# and a big-endian u32 iteration count, then salt, nonce, tag and
+# ciphertext. Version 2 uses GCM's standard 12-byte nonce; version 1 used
+# 16. Blobs without a magic are the original layout, derived with PBKDF2's
+# defaults.
+MAGIC = b'EDK1'
+ENVELOPE_MAGIC = b'EDK2'
+NONCE_SIZES = {MAGIC: 16, ENVELOPE_MAGIC: 12}
+TAG_SIZE = 16
+KDF_HEADER = struct.Struct('!BI')
+KDF_HASHES = {'SHA1': SHA1, 'SHA256': SHA256, 'SHA512': SHA512}
+KDF_HASH_NAMES = {1: 'SHA1', 2: 'SHA256', 3: 'SHA512'}
+KDF_HASH_IDS = {name: hash_id for hash_id, name in KDF_HASH_NAMES.items()}
+LEGACY_KDF = ('SHA1', 1000)
+SALT_SIZE = 16
+# The iteration count is read before anything is authenticated, so a forged
+# header could otherwise make a single derivation run for hours.
+MAX_ITERATIONS = 2_000_000
+
+def kdf_hash_name(hash_id: int, iterations: int) -> str:
+    if hash_id not in KDF_HASH_NAMES:
+        raise ValueError(f"Unknown KDF hash id: {hash_id}")
+    if not 0 < iterations <= MAX_ITERATIONS:
+        raise ValueError(f"KDF iterations must be between 1 and {MAX_ITERATIONS}, got {iterations}")
+    return KDF_HASH_NAMES[hash_id]
+
+# Streaming container: STREAM_MAGIC, the KDF header, the salt and the chunk
+# size, then chunks of (flags, length, nonce, tag, ciphertext). Each chunk's
+# index and flags are authenticated as associated data, so reordered,
+# dropped or truncated chunks fail verification; the last chunk is flagged
+# and may be empty.
+STREAM_MAGIC = b'EDSTRM01'
+STREAM_HEADER = struct.Struct('!BI16sI')
+CHUNK_HEADER = struct.Struct('!BI12s16s')
+CHUNK_AAD = struct.Struct('!QB')
+FINAL_CHUNK = 1
+DEFAULT_CHUNK_SIZE = 1 << 20
+# The chunk size in a stream header is read before anything is
+# authenticated and sizes two buffers, so it is capped.
+MAX_CHUNK_SIZE = 64 << 20
+
+def check_chunk_size(chunk_size: int):
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes, got {chunk_size}")
+
+def derive_key(password: str, salt: bytes, hash_name: str, iterations: int) -> bytearray:
+    # A bytearray so the cache can zero it; the intermediate bytes object
+    # returned by PBKDF2 is unavoidable and left to the allocator.
+    return bytearray(PBKDF2(password, salt, dkLen=32, count=iterations,
+                            hmac_hash_module=KDF_HASHES[hash_name]))
+
+def read_into(src, view: memoryview) -> int:
+    # Fills view from src, returning fewer bytes only at end of file.
+    filled = 0
+    while filled < len(view):
+        count = src.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+class KeyCache:
+    # Bounded LRU of derived keys keyed by (salt, hash name, iterations).
+    # Evicted and cleared keys are overwritten with zeros.
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.keys = OrderedDict()
+
+    def get(self, salt: bytes, hash_name: str, iterations: int):
+        key = self.keys.get((salt, hash_name, iterations))
+        if key is not None:
+            self.keys.move_to_end((salt, hash_name, iterations))
+        return key
+
+    def put(self, salt: bytes, hash_name: str, iterations: int, key: bytearray):
+        self.keys[(salt, hash_name, iterations)] = key
+        self.keys.move_to_end((salt, hash_name, iterations))
+        while len(self.keys) > self.max_size:
+            self.zero(self.keys.popitem(last=False)[1])
+
+    def evict(self, salt: bytes, hash_name: str, iterations: int):
+        key = self.keys.pop((salt, hash_name, iterations), None)
+        if key is not None:
+            self.zero(key)
+
+    def clear(self):
+        while self.keys:
+            self.zero(self.keys.popitem()[1])
+
+    def zero(self, key: bytearray):
+        key[:] = bytes(len(key))
+
+    def __len__(self):
+        return len(self.keys)
+
+# Per-process codec for encrypt_many/decrypt_many pools, built once by the
+# pool initializer from the parent's already-derived key.
+WORKER_CODEC = None
+
+def init_worker_codec(password, iterations, hash_name, salt, key):
+    global WORKER_CODEC
+    WORKER_CODEC = EncryptionDecryption(password, iterations, hash_name, salt=salt, key=key)
+
+def run_worker_codec(method, records):
+    return getattr(WORKER_CODEC, method)(records)
 
 class EncryptionDecryption:
-    def __init__(self, password: str):
-        self.salt = get_random_bytes(16)
+    def __init__(self, password: str, iterations: int = 100_000, hash_name: str = 'SHA256', cache_size: int = 128,
+                 salt: bytes = None, key: bytes = None):
+        if hash_name not in KDF_HASH_IDS:
+            raise ValueError(f"Unsupported KDF hash: {hash_name}")
+        # Blobs written with more iterations than MAX_ITERATIONS couldn't be
+        # read back, so refuse to write them.
+        kdf_hash_name(KDF_HASH_IDS[hash_name], iterations)
+        self.salt = salt or get_random_bytes(SALT_SIZE)
         self.password = password
-        self.key = self.derive_key()
+        self.iterations = iterations
+        self.hash_name = hash_name
+        self.key_cache = KeyCache(cache_size)
+        self.key = bytearray(key) if key is not None else self.derive_key()
+        self.prefix = ENVELOPE_MAGIC + KDF_HEADER.pack(KDF_HASH_IDS[hash_name], iterations) + self.salt
+
+    def derive_key(self) -> bytearray:
+        return derive_key(self.password, self.salt, self.hash_name, self.iterations)
+
+    def key_for(self, salt, hash_name: str, iterations: int) -> bytearray:
+        if salt == self.salt and hash_name == self.hash_name and iterations == self.iterations:
+            return self.key
+        salt = bytes(salt)
+        key = self.key_cache.get(salt, hash_name, iterations)
+        if key is None:
+            key = derive_key(self.password, salt, hash_name, iterations)
+            self.key_cache.put(salt, hash_name, iterations, key)
+        return key
+
+    def clear_keys(self):
+        self.key_cache.clear()
 
-    def derive_key(self) -> bytes:
-        return PBKDF2(self.password, self.salt, dkLen=32)
+    def encrypt_bytes(self, data, encoding: str = None):
+        # Accepts any bytes-like object and builds the envelope in a single
+        # preallocated bytearray, with GCM writing the ciphertext in place.
+        # encoding='base64' adds the optional text-safe outer layer.
+        view = memoryview(data).cast('B')
+        prefix_size = len(self.prefix)
+        body = prefix_size + 12 + TAG_SIZE
+        nonce = get_random_bytes(12)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        envelope = bytearray(body + len(view))
+        envelope[:prefix_size] = self.prefix
+        envelope[prefix_size:prefix_size + 12] = nonce
+        cipher.encrypt(view, output=memoryview(envelope)[body:])
+        envelope[prefix_size + 12:body] = cipher.digest()
+        if encoding == 'base64':
+            return base64.b64encode(envelope)
+        if encoding is not None:
+            raise ValueError(f"Unsupported outer encoding: {encoding}")
+        return envelope
+
+    def decrypt_bytes(self, data, encoding: str = None) -> bytes:
+        # Parses every envelope version through memoryview slices, so the
+        # only new buffer is the plaintext.
+        if encoding == 'base64':
+            data = base64.b64decode(data)
+        elif encoding is not None:
+            raise ValueError(f"Unsupported outer encoding: {encoding}")
+        view = memoryview(data).cast('B')
+        magic = bytes(view[:4])
+        if magic in NONCE_SIZES:
+            if len(view) < 4 + KDF_HEADER.size:
+                raise ValueError("Encrypted record is truncated")
+            hash_id, iterations = KDF_HEADER.unpack_from(view, 4)
+            hash_name = kdf_hash_name(hash_id, iterations)
+            offset = 4 + KDF_HEADER.size
+            nonce_size = NONCE_SIZES[magic]
+        else:
+            hash_name, iterations = LEGACY_KDF
+            offset = 0
+            nonce_size = 16
+        nonce_offset = offset + SALT_SIZE
+        tag_offset = nonce_offset + nonce_size
+        body = tag_offset + TAG_SIZE
+        if len(view) < body:
+            raise ValueError("Encrypted record is truncated")
+        key = self.key_for(view[offset:nonce_offset], hash_name, iterations)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=view[nonce_offset:tag_offset])
+        return cipher.decrypt_and_verify(view[body:], view[tag_offset:body])
 
     def encrypt(self, data: str) -> str:
-        cipher = AES.new(self.key, AES.MODE_GCM)
-        ciphertext, tag = cipher.encrypt_and_digest(data.encode('utf-8'))
-        return base64.b64encode(self.salt + cipher.nonce + tag + ciphertext).decode('utf-8')
+        return self.encrypt_bytes(data.encode('utf-8'), 'base64').decode('ascii')
 
     def decrypt(self, encrypted_data: str) -> str:
-        raw_data = base64.b64decode(encrypted_data.encode('utf-8'))
-        salt = raw_data[:16]
-        nonce = raw_data[16:32]
-        tag = raw_data[32:48]
-        ciphertext = raw_data[48:]
-        key = PBKDF2(self.password, salt, dkLen=32)
-        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
-        return cipher.decrypt_and_verify(ciphertext, tag).decode('utf-8')
+        return self.decrypt_bytes(encrypted_data, 'base64').decode('utf-8')
+
+    def encrypt_records(self, records) -> list:
+        encrypt_bytes = self.encrypt_bytes
+        return [encrypt_bytes(record) for record in records]
+
+    def decrypt_records(self, records) -> list:
+        # A record that fails authentication or parsing comes back as its
+        # ValueError instead of aborting the batch.
+        decrypt_bytes = self.decrypt_bytes
+        results = []
+        for record in records:
+            try:
+                results.append(decrypt_bytes(record))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+    def map_records(self, method: str, records, workers: int = None, chunk_size: int = 1024):
+        # Chunks go to a process pool whose workers reuse this instance's
+        # key, so nothing is re-derived; at most 2 * workers chunks are in
+        # flight and results are yielded in input order.
+        records = iter(records)
+        chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+        if not workers or workers <= 1:
+            for chunk in chunks:
+                yield from getattr(self, method)(chunk)
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_codec,
+                                 initargs=(self.password, self.iterations, self.hash_name,
+                                           self.salt, bytes(self.key))) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(run_worker_codec, method, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def encrypt_many(self, records, workers: int = None, chunk_size: int = 1024):
+        return self.map_records('encrypt_records', records, workers, chunk_size)
+
+    def decrypt_many(self, records, workers: int = None, chunk_size: int = 1024):
+        return self.map_records('decrypt_records', records, workers, chunk_size)
+
+    def encrypt_stream(self, src, dst, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        # Reads src with readinto into one reusable buffer and encrypts each
+        # chunk into a second one, so memory stays at two chunks whatever
+        # the input size.
+        check_chunk_size(chunk_size)
+        dst.write(STREAM_MAGIC + STREAM_HEADER.pack(KDF_HASH_IDS[self.hash_name], self.iterations,
+                                                    self.salt, chunk_size))
+        plaintext = bytearray(chunk_size)
+        ciphertext = bytearray(chunk_size)
+        index = 0
+        while True:
+            count = read_into(src, memoryview(plaintext))
+            flags = FINAL_CHUNK if count < chunk_size else 0
+            nonce = get_random_bytes(12)
+            cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(CHUNK_AAD.pack(index, flags))
+            out = memoryview(ciphertext)[:count]
+            cipher.encrypt(memoryview(plaintext)[:count], output=out)
+            dst.write(CHUNK_HEADER.pack(flags, count, nonce, cipher.digest()))
+            dst.write(out)
+            if flags & FINAL_CHUNK:
+                return
+            index += 1
+
+    def decrypt_stream(self, src, dst):
+        # Each chunk is verified before any of its plaintext is written, but
+        # chunks before a failing one have already reached dst; decrypt_file
+        # discards them, other callers should do the same on ValueError.
+        header = src.read(len(STREAM_MAGIC) + STREAM_HEADER.size)
+        if len(header) < len(STREAM_MAGIC) + STREAM_HEADER.size or not header.startswith(STREAM_MAGIC):
+            raise ValueError("Not an encrypted stream")
+        hash_id, iterations, salt, chunk_size = STREAM_HEADER.unpack_from(header, len(STREAM_MAGIC))
+        check_chunk_size(chunk_size)
+        key = self.key_for(salt, kdf_hash_name(hash_id, iterations), iterations)
+        ciphertext = bytearray(chunk_size)
+        plaintext = bytearray(chunk_size)
+        index = 0
+        while True:
+            chunk_header = src.read(CHUNK_HEADER.size)
+            if len(chunk_header) < CHUNK_HEADER.size:
+                raise ValueError("Encrypted stream is truncated")
+            flags, count, nonce, tag = CHUNK_HEADER.unpack(chunk_header)
+            if count > chunk_size:
+                raise ValueError("Chunk length exceeds the stream's chunk size")
+            if read_into(src, memoryview(ciphertext)[:count]) < count:
+                raise ValueError("Encrypted stream is truncated")
+            cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+            cipher.update(CHUNK_AAD.pack(index, flags))
+            out = memoryview(plaintext)[:count]
+            cipher.decrypt(memoryview(ciphertext)[:count], output=out)
+            cipher.verify(tag)
+            dst.write(out)
+            if flags & FINAL_CHUNK:
+                return
+            index += 1
+
+    def encrypt_file(self, src_path: str, dst_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        check_chunk_size(chunk_size)
+        with open(src_path, 'rb', buffering=0) as src, open(dst_path, 'wb', buffering=chunk_size) as dst:
+            self.encrypt_stream(src, dst, chunk_size)
+
+    def decrypt_file(self, src_path: str, dst_path: str):
+        # Plaintext goes to a temporary file that only replaces dst_path once
+        # the whole stream has verified.
+        tmp_path = dst_path + '.tmp'
+        try:
+            with open(src_path, 'rb', buffering=DEFAULT_CHUNK_SIZE) as src, open(tmp_path, 'wb', buffering=0) as dst:
+                self.decrypt_stream(src, dst)
+            os.replace(tmp_path, dst_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
     def save_to_file(self, filename: str, data: str):
-        encrypted_data = self.encrypt(data)
-        with open(filename, 'w') as f:
-            f.write(json.dumps({'data': encrypted_data}))
+        with open(filename, 'wb') as f:
+            self.encrypt_stream(io.BytesIO(data.encode('utf-8')), f)
 
     def load_from_file(self, filename: str) -> str:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            return self.decrypt(data['data'])
+        with open(filename, 'rb') as f:
+            if f.read(len(STREAM_MAGIC)) != STREAM_MAGIC:
+                # Files written before the streaming container are JSON.
+                f.seek(0)
+                return self.decrypt(json.load(f)['data'])
+            f.seek(0)
+            out = io.BytesIO()
+            self.decrypt_stream(f, out)
+            return out.getvalue().decode('utf-8')
 
 def main():
     print("Encryption and Decryption System")
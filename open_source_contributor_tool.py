@@ -1,63 +1,262 @@
 import os
+import sys
 import json
+from collections import Counter
 from datetime import datetime
 
+class Contribution:
+    # Slotted record; repo names and types repeat heavily and are interned.
+    # Item access keeps the old dict-style contribution['repo_name'] working.
+    __slots__ = ('repo_name', 'date', 'type', 'description')
+
+    def __init__(self, repo_name, date, contribution_type, description):
+        self.repo_name = sys.intern(repo_name)
+        self.date = date
+        self.type = sys.intern(contribution_type)
+        self.description = description
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def key(self):
+        return (self.repo_name, self.date, self.type, self.description)
+
+    def to_dict(self):
+        return {"repo_name": self.repo_name, "date": self.date, "type": self.type, "description": self.description}
+
 class Contributor:
+    __slots__ = ('name', 'email', 'contributions')
+
     def __init__(self, name, email):
         self.name = name
         self.email = email
         self.contributions = []
 
     def add_contribution(self, repo_name, date, contribution_type, description):
-        self.contributions.append({
-            "repo_name": repo_name,
-            "date": date,
-            "type": contribution_type,
-            "description": description
-        })
+        self.contributions.append(Contribution(repo_name, date, contribution_type, description))
 
     def get_contributions(self):
         return self.contributions
 
+    def to_dict(self):
+        return {"name": self.name, "email": self.email,
+                "contributions": [contribution.to_dict() for contribution in self.contributions]}
+
     def __repr__(self):
         return f"Contributor({self.name}, {self.email})"
 
+class ContributorLog:
+    # Append-only JSON-lines store. Each line is one change: a contributor
+    # record ({"name", "email"}) or a contribution record (the contribution
+    # fields plus "email"). Replaying the file in order rebuilds the tracker.
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def replay(self):
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def append(self, records):
+        with open(self.file_path, 'a') as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+
+    def rewrite(self, records):
+        temp_path = self.file_path + '.tmp'
+        with open(temp_path, 'w') as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+        os.replace(temp_path, self.file_path)
+
 class ContributorTracker:
-    def __init__(self):
-        self.contributors = []
+    # Contributors are indexed by email. Per-repo and per-type counters of
+    # contributions by email double as secondary indexes and as aggregates,
+    # alongside per-month counts; all are updated as contributions arrive.
+    # With a log_path, changes are queued and save() appends only those to
+    # the log. Records are never updated or deleted, so the log holds no
+    # superseded entries; compact() rewrites it from memory on request.
+    def __init__(self, log_path=None):
+        self.contributors = {}
+        self.by_repo = {}
+        self.by_type = {}
+        self.type_counts = Counter()
+        self.repo_type_counts = {}
+        self.monthly_counts = Counter()
+        self.pending = []
+        # The log is attached after replay so replayed records aren't queued.
+        self.log = None
+        log = ContributorLog(log_path) if log_path else None
+        if log is not None:
+            for record in log.replay():
+                self.apply_record(record)
+        self.log = log
+
+    def apply_record(self, record):
+        if 'repo_name' in record:
+            if record['email'] not in self.contributors and 'name' in record:
+                self.add_contributor(record['name'], record['email'])
+            return self.add_contribution(record['email'], record['repo_name'], record['date'],
+                                         record['type'], record['description'])
+        return self.add_contributor(record['name'], record['email'])
 
     def add_contributor(self, name, email):
-        contributor = Contributor(name, email)
-        self.contributors.append(contributor)
+        contributor = self.contributors.get(email)
+        if contributor is None:
+            contributor = Contributor(name, email)
+            self.contributors[email] = contributor
+            if self.log is not None:
+                self.pending.append({'name': name, 'email': email})
+        return contributor
+
+    def add_contribution(self, email, repo_name, date, contribution_type, description):
+        contributor = self.contributors.get(email)
+        if contributor is None:
+            return None
+        contributor.add_contribution(repo_name, date, contribution_type, description)
+        contribution = contributor.contributions[-1]
+        self.index_contribution(email, contribution)
+        if self.log is not None:
+            self.pending.append(dict(contribution.to_dict(), email=email))
+        return contributor
+
+    def index_contribution(self, email, contribution):
+        repo_counts = self.by_repo.get(contribution.repo_name)
+        if repo_counts is None:
+            repo_counts = self.by_repo[contribution.repo_name] = Counter()
+        repo_counts[email] += 1
+        type_counts = self.by_type.get(contribution.type)
+        if type_counts is None:
+            type_counts = self.by_type[contribution.type] = Counter()
+        type_counts[email] += 1
+        self.type_counts[contribution.type] += 1
+        repo_types = self.repo_type_counts.get(contribution.repo_name)
+        if repo_types is None:
+            repo_types = self.repo_type_counts[contribution.repo_name] = Counter()
+        repo_types[contribution.type] += 1
+        self.monthly_counts[contribution.date[:7]] += 1
 
     def find_contributor(self, email):
-        for contributor in self.contributors:
-            if contributor.email == email:
-                return contributor
-        return None
+        return self.contributors.get(email)
+
+    def contributors_for_repo(self, repo_name):
+        return [self.contributors[email] for email in self.by_repo.get(repo_name, ())]
+
+    def contributors_by_type(self, contribution_type):
+        return [self.contributors[email] for email in self.by_type.get(contribution_type, ())]
+
+    def top_contributors(self, repo_name, count=10):
+        return [(self.contributors[email], contributions)
+                for email, contributions in self.by_repo.get(repo_name, Counter()).most_common(count)]
+
+    def contributions_per_month(self):
+        return sorted(self.monthly_counts.items())
+
+    def type_breakdown(self, repo_name=None):
+        if repo_name is None:
+            return dict(self.type_counts)
+        return dict(self.repo_type_counts.get(repo_name, {}))
+
+    def import_jsonl(self, file_path, flush_every=10000):
+        # Streams a JSON-lines export in the log's record format; contribution
+        # records may carry a "name" to create unknown contributors. With a
+        # log, changes are saved every flush_every records so the pending
+        # queue stays bounded.
+        imported = 0
+        with open(file_path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    self.apply_record(json.loads(line))
+                    imported += 1
+                    if len(self.pending) >= flush_every:
+                        self.save()
+        self.save()
+        return imported
+
+    def import_git_log(self, file_path, repo_name, contribution_type='code', flush_every=10000):
+        # Expects one commit per line as produced by
+        #   git log --date=short --pretty=format:'%H%x09%an%x09%ae%x09%ad%x09%s'
+        imported = 0
+        with open(file_path, 'r') as file:
+            for line in file:
+                fields = line.rstrip('\n').split('\t', 4)
+                if len(fields) < 5:
+                    continue
+                commit, name, email, date, subject = fields
+                self.add_contributor(name, email)
+                self.add_contribution(email, repo_name, date, contribution_type, subject)
+                imported += 1
+                if len(self.pending) >= flush_every:
+                    self.save()
+        self.save()
+        return imported
+
+    def records(self):
+        for contributor in self.contributors.values():
+            yield {'name': contributor.name, 'email': contributor.email}
+            for contribution in contributor.contributions:
+                yield dict(contribution.to_dict(), email=contributor.email)
+
+    def save(self):
+        if self.log is None or not self.pending:
+            return
+        self.log.append(self.pending)
+        self.pending = []
+
+    def compact(self):
+        if self.log is None:
+            raise ValueError("compact() needs a tracker created with a log_path")
+        self.log.rewrite(self.records())
+        self.pending = []
 
     def save_to_file(self, file_path):
         with open(file_path, 'w') as file:
-            json.dump([contributor.__dict__ for contributor in self.contributors], file)
+            json.dump([contributor.to_dict() for contributor in self.contributors.values()], file)
 
     def load_from_file(self, file_path):
+        # Contributors already known by email are merged rather than
+        # duplicated, and contributions they already have are skipped.
         if os.path.exists(file_path):
             with open(file_path, 'r') as file:
                 contributors_data = json.load(file)
                 for contributor_data in contributors_data:
-                    contributor = Contributor(contributor_data['name'], contributor_data['email'])
-                    contributor.contributions = contributor_data['contributions']
-                    self.contributors.append(contributor)
+                    contributor = self.add_contributor(contributor_data['name'], contributor_data['email'])
+                    known = {contribution.key() for contribution in contributor.contributions}
+                    for contribution in contributor_data['contributions']:
+                        key = (contribution['repo_name'], contribution['date'], contribution['type'], contribution['description'])
+                        if key not in known:
+                            known.add(key)
+                            self.add_contribution(contributor.email, *key)
+
+    def display_contributors(self, file=None):
+        # One buffered write per contributor instead of a print per line.
+        file = file or sys.stdout
+        for contributor in self.contributors.values():
+            lines = [f"Name: {contributor.name}, Email: {contributor.email}\n"]
+            lines.extend(f"\tRepo: {contribution.repo_name}, Date: {contribution.date}, Type: {contribution.type}, Description: {contribution.description}\n"
+                         for contribution in contributor.contributions)
+            file.write(''.join(lines))
 
-    def display_contributors(self):
-        for contributor in self.contributors:
-            print(f"Name: {contributor.name}, Email: {contributor.email}")
-            for contribution in contributor.get_contributions():
-                print(f"\tRepo: {contribution['repo_name']}, Date: {contribution['date']}, Type: {contribution['type']}, Description: {contribution['description']}")
+    def display_statistics(self, repo_name=None, count=10):
+        if repo_name:
+            print(f"Top contributors to {repo_name}:")
+            for contributor, contributions in self.top_contributors(repo_name, count):
+                print(f"\t{contributor.name} <{contributor.email}>: {contributions}")
+        print("Contributions per month:")
+        for month, contributions in self.contributions_per_month():
+            print(f"\t{month}: {contributions}")
+        print("Contributions by type:")
+        for contribution_type, contributions in sorted(self.type_breakdown(repo_name).items()):
+            print(f"\t{contribution_type}: {contributions}")
 
 def main():
-    tracker = ContributorTracker()
-    tracker.load_from_file('contributors.json')
+    tracker = ContributorTracker('contributors.jsonl')
+    if not tracker.contributors:
+        # One-off migration from the old whole-file JSON format.
+        tracker.load_from_file('contributors.json')
 
     while True:
         print("\nOpen Source Contributor Tracker")
@@ -66,7 +265,8 @@ def main():
         print("3. Display Contributors")
         print("4. Save and Exit")
         print("5. Exit without Saving")
-        choice = input("Choose an option (1-5): ")
+        print("6. Show Statistics")
+        choice = input("Choose an option (1-6): ")
 
         if choice == '1':
             name = input("Enter contributor name: ")
@@ -81,19 +281,22 @@ def main():
                 date = datetime.now().strftime("%Y-%m-%d")
                 contribution_type = input("Enter contribution type (e.g., 'code', 'documentation'): ")
                 description = input("Enter description of contribution: ")
-                contributor.add_contribution(repo_name, date, contribution_type, description)
+                tracker.add_contribution(email, repo_name, date, contribution_type, description)
                 print("Contribution added.")
             else:
                 print("Contributor not found.")
         elif choice == '3':
             tracker.display_contributors()
         elif choice == '4':
-            tracker.save_to_file('contributors.json')
+            tracker.save()
             print("Data saved. Exiting...")
             break
         elif choice == '5':
             print("Exiting without saving...")
             break
+        elif choice == '6':
+            repo_name = input("Enter repository name (blank for all): ")
+            tracker.display_statistics(repo_name or None)
         else:
             print("Invalid choice. Please try again.")
 
@@ -1,34 +1,267 @@
 import numpy as np
 import itertools
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# States smaller than this are not worth splitting across threads.
+PARALLEL_THRESHOLD = 2**16
+SCRATCH_AMPLITUDES = 2**16
 
 class QuantumGate:
     def __init__(self, matrix):
         self.matrix = matrix
+        self.num_qubits = int(np.log2(len(matrix)))
 
     def apply(self, state):
         return np.dot(self.matrix, state)
 
+class Instruction:
+    def __init__(self, gate, target_qubit, control_qubit=None):
+        self.gate = gate
+        self.target_qubit = target_qubit
+        self.control_qubit = control_qubit
+
+    @property
+    def qubits(self):
+        if self.control_qubit is None:
+            return [self.target_qubit]
+        return [self.control_qubit, self.target_qubit]
+
+class FusedGate:
+    def __init__(self, matrix, qubits, previous):
+        self.matrix = matrix
+        self.qubits = qubits
+        self.previous = previous
+        self.removed = False
+
+    def embed(self, matrix, qubits):
+        # Expresses a gate on a subset (or reordering) of this gate's qubits
+        # as a matrix over self.qubits.
+        if qubits == self.qubits:
+            return matrix
+        if len(qubits) == 2:
+            swap = np.eye(4)[[0, 2, 1, 3]]
+            return swap @ matrix @ swap
+        if qubits[0] == self.qubits[0]:
+            return np.kron(matrix, np.eye(2))
+        return np.kron(np.eye(2), matrix)
+
+def compile_circuit(instructions):
+    # Fuses runs of gates into as few 2x2 / 4x4 blocks as possible so that
+    # each block costs one pass over the state. A gate is only ever folded
+    # into the most recent block on its wires, so ordering is preserved.
+    fused = []
+    last = {}
+
+    def remove(block):
+        block.removed = True
+        for qubit in block.qubits:
+            last[qubit] = block.previous[qubit]
+
+    def is_last(block):
+        return all(last.get(qubit) is block for qubit in block.qubits)
+
+    for instruction in instructions:
+        qubits = instruction.qubits
+        matrix = np.asarray(instruction.gate.matrix, dtype=np.complex128)
+        if len(qubits) == 2:
+            # Pull trailing single-qubit blocks on either wire into this one.
+            for position, qubit in enumerate(qubits):
+                block = last.get(qubit)
+                if block is not None and len(block.qubits) == 1:
+                    expanded = np.kron(block.matrix, np.eye(2)) if position == 0 else np.kron(np.eye(2), block.matrix)
+                    matrix = matrix @ expanded
+                    remove(block)
+        block = last.get(qubits[0])
+        if block is not None and set(qubits) <= set(block.qubits) and all(last.get(qubit) is block for qubit in qubits):
+            block.matrix = block.embed(matrix, qubits) @ block.matrix
+            if np.allclose(block.matrix, np.eye(len(block.matrix))) and is_last(block):
+                remove(block)
+            continue
+        block = FusedGate(matrix, qubits, {qubit: last.get(qubit) for qubit in qubits})
+        for qubit in qubits:
+            last[qubit] = block
+        fused.append(block)
+    return [(block.matrix, block.qubits) for block in fused if not block.removed]
+
+def amplitude_views(tensor, axes):
+    # One strided view of the tensor per basis value of the given axes,
+    # ordered so that views[i] pairs with row/column i of the gate matrix.
+    views = []
+    for bits in itertools.product((0, 1), repeat=len(axes)):
+        index = [slice(None)] * tensor.ndim
+        for axis, bit in zip(axes, bits):
+            index[axis] = slice(bit, bit + 1)
+        views.append(tensor[tuple(index)])
+    return views
+
+def apply_block(tensor, matrix, axes):
+    if np.count_nonzero(matrix - np.diag(np.diagonal(matrix))) == 0:
+        for view, factor in zip(amplitude_views(tensor, axes), np.diagonal(matrix)):
+            if factor != 1:
+                view *= factor
+        return
+    # A dense gate needs the old amplitudes while writing the new ones. Fix
+    # the most significant free bits so each pass only copies a block of at
+    # most SCRATCH_AMPLITUDES, instead of the whole (possibly memory-mapped)
+    # state.
+    free_axes = [axis for axis in range(tensor.ndim) if axis not in axes and tensor.shape[axis] > 1]
+    split_bits = 0
+    while tensor.size >> split_bits > SCRATCH_AMPLITUDES and split_bits < len(free_axes):
+        split_bits += 1
+    for bits in itertools.product((0, 1), repeat=split_bits):
+        index = [slice(None)] * tensor.ndim
+        for axis, bit in zip(free_axes, bits):
+            index[axis] = slice(bit, bit + 1)
+        apply_dense_block(tensor[tuple(index)], matrix, axes)
+
+def apply_dense_block(tensor, matrix, axes):
+    views = amplitude_views(tensor, axes)
+    old = [view.copy() for view in views]
+    for row, view in enumerate(views):
+        columns = np.nonzero(matrix[row])[0]
+        np.multiply(old[columns[0]], matrix[row, columns[0]], out=view)
+        for column in columns[1:]:
+            view += matrix[row, column] * old[column]
+
+def make_instruction(gate, target_qubit, control_qubit, qubits):
+    # Qubit k is bit k of the basis index. Two-qubit gates act on
+    # (control, target) with the control as the most significant bit,
+    # defaulting to the wire just below the target.
+    if gate.num_qubits == 1:
+        return Instruction(gate, target_qubit)
+    if control_qubit is None:
+        control_qubit = (target_qubit - 1) % qubits
+    if control_qubit == target_qubit:
+        raise ValueError("Control and target qubits must differ")
+    return Instruction(gate, target_qubit, control_qubit)
+
+def is_real_gate(gate):
+    return not np.iscomplexobj(gate.matrix) or not np.any(np.imag(gate.matrix))
+
+def is_real_circuit(instructions):
+    return all(is_real_gate(instruction.gate) for instruction in instructions)
+
 class QuantumCircuit:
-    def __init__(self, qubits):
+    def __init__(self, qubits, workers=1, state=None, dtype=np.complex128):
+        # dtype fixes the amplitude precision for the whole run: complex64
+        # halves memory, and float32/float64 are enough for circuits whose
+        # gates are all real (H, X, Z, CNOT).
         self.qubits = qubits
-        self.state = self.initialize_state()
+        self.dtype = np.dtype(dtype) if state is None else state.dtype
+        self.gates = []
+        self.executed = 0
+        # NumPy releases the GIL inside its ufunc loops, so a thread pool
+        # over disjoint slices of the state scales across cores.
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.state = self.initialize_state() if state is None else state
+        # Set for states memory-mapped 'r+' from a checkpoint, whose header
+        # has to follow the gates applied to the file.
+        self.checkpoint = None
 
     def initialize_state(self):
-        return np.array([1] + [0] * (2**self.qubits - 1))
-
-    def apply_gate(self, gate, target_qubit):
-        identity = np.identity(2**self.qubits)
-        gate_matrix = gate.matrix
-        for i in range(2**self.qubits):
-            for j in range(len(gate_matrix)):
-                index = (i // (2**target_qubit)) * (2**target_qubit) + (i % (2**target_qubit))
-                identity[i][index] = gate_matrix[j // 2][j % 2] if (i % 2 == j) else identity[i][index]
-        self.state = np.dot(identity, self.state)
+        state = np.zeros(2**self.qubits, dtype=self.dtype)
+        state[0] = 1
+        return state
+
+    def promote(self, dtype):
+        # Swaps in a wider copy of the state; pending gates are unaffected.
+        if np.result_type(self.dtype, dtype) != self.dtype:
+            self.dtype = np.result_type(self.dtype, dtype)
+            self.state = self.state.astype(self.dtype)
+
+    def instruction(self, gate, target_qubit, control_qubit=None):
+        if self.dtype.kind != 'c' and not is_real_gate(gate):
+            raise ValueError(f"{type(gate).__name__} needs a complex state, not {self.dtype}")
+        return make_instruction(gate, target_qubit, control_qubit, self.qubits)
+
+    def add_gate(self, gate, target_qubit, control_qubit=None):
+        self.gates.append(self.instruction(gate, target_qubit, control_qubit))
+
+    def execute(self):
+        if self.executed == len(self.gates):
+            return self.state
+        if self.checkpoint is not None:
+            self.checkpoint.encode_header(self, self.gates)
+        for matrix, qubits in compile_circuit(self.gates[self.executed:]):
+            self.apply_matrix(matrix, qubits)
+        self.executed = len(self.gates)
+        if self.checkpoint is not None:
+            self.checkpoint.update(self)
+        return self.state
+
+    def apply_gate(self, gate, target_qubit, control_qubit=None):
+        self.execute()
+        instruction = self.instruction(gate, target_qubit, control_qubit)
+        if self.checkpoint is not None:
+            self.checkpoint.encode_header(self, self.gates + [instruction])
+        self.apply_matrix(gate.matrix, instruction.qubits)
+        self.gates.append(instruction)
+        self.executed = len(self.gates)
+        if self.checkpoint is not None:
+            self.checkpoint.update(self)
+
+    def apply_matrix(self, matrix, qubits):
+        # Updates the state in place in O(2^n); the full 2^n x 2^n operator
+        # is never built.
+        # Casting the matrix up front keeps every update in the state's dtype.
+        matrix = np.asarray(matrix if self.dtype.kind == 'c' else np.real(matrix)).astype(self.dtype, copy=False)
+        tensor = self.state.reshape((2,) * self.qubits)
+        axes = [self.qubits - 1 - qubit for qubit in qubits]
+        if self.executor is None or self.state.size < PARALLEL_THRESHOLD:
+            apply_block(tensor, matrix, axes)
+            return
+        blocks = self.split_tensor(tensor, axes)
+        list(self.executor.map(lambda block: apply_block(block, matrix, axes), blocks))
+
+    def split_tensor(self, tensor, axes):
+        # Fixes the most significant bits not touched by the gate, giving
+        # independent sub-tensors that workers can update without locking.
+        free_axes = [axis for axis in range(self.qubits) if axis not in axes]
+        split_bits = min(len(free_axes), int(np.ceil(np.log2(self.workers * 4))))
+        blocks = []
+        for bits in itertools.product((0, 1), repeat=split_bits):
+            index = [slice(None)] * self.qubits
+            for axis, bit in zip(free_axes, bits):
+                index[axis] = slice(bit, bit + 1)
+            blocks.append(tensor[tuple(index)])
+        return blocks
+
+    def probabilities(self):
+        self.execute()
+        if self.executor is None or self.state.size < PARALLEL_THRESHOLD:
+            return np.abs(self.state)**2
+        probabilities = np.empty(self.state.size, dtype=self.state.real.dtype)
+        bounds = np.linspace(0, self.state.size, self.workers * 4 + 1).astype(int)
+
+        def fill(chunk):
+            np.abs(self.state[chunk], out=probabilities[chunk])
+            np.square(probabilities[chunk], out=probabilities[chunk])
+
+        list(self.executor.map(fill, [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]))
+        return probabilities
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def sample(self, shots):
+        # Draws every shot from one cumulative distribution instead of
+        # re-evolving the state per shot.
+        cumulative = np.cumsum(self.probabilities(), dtype=np.float64)
+        cumulative /= cumulative[-1]
+        samples = np.searchsorted(cumulative, np.random.random(shots), side='right')
+        return np.minimum(samples, len(cumulative) - 1)
+
+    def sample_bits(self, shots):
+        samples = self.sample(shots)
+        return ((samples[:, None] >> np.arange(self.qubits)) & 1).astype(np.uint8)
 
     def measure(self):
-        probabilities = np.abs(self.state)**2
-        outcomes = np.arange(len(probabilities))
-        return np.random.choice(outcomes, p=probabilities)
+        return int(self.sample(1)[0])
 
 class HadamardGate(QuantumGate):
     def __init__(self):
@@ -58,63 +291,238 @@ class CNOTGate(QuantumGate):
                                  [0, 0, 1, 0]])
         super().__init__(cnot_matrix)
 
-class QuantumSimulator:
+GATE_TYPES = {gate.__name__: gate for gate in (HadamardGate, PauliXGate, PauliYGate, PauliZGate, CNOTGate)}
+CLIFFORD_GATES = (HadamardGate, PauliXGate, PauliYGate, PauliZGate, CNOTGate)
+
+# Above this many qubits run(shots) refuses to build a dense 2^n count
+# array; counts(shots) returns a sparse {bitstring: count} dict instead.
+MAX_COUNT_QUBITS = 24
+
+def pauli_phase_exponents(x1, z1, x2, z2):
+    # Power of i picked up per qubit when multiplying Pauli (x1, z1) into
+    # (x2, z2), following Aaronson & Gottesman's g function.
+    x1 = x1.astype(np.int64)
+    z1 = z1.astype(np.int64)
+    x2 = x2.astype(np.int64)
+    z2 = z2.astype(np.int64)
+    return np.where(x1 & z1, z2 - x2,
+                    np.where(x1, z2 * (2 * x2 - 1),
+                             np.where(z1, x2 * (1 - 2 * z2), 0)))
+
+def gf2_row_basis(matrix):
+    matrix = matrix.copy()
+    rank = 0
+    for column in range(matrix.shape[1]):
+        pivots = np.nonzero(matrix[rank:, column])[0]
+        if pivots.size == 0:
+            continue
+        pivot = rank + pivots[0]
+        matrix[[rank, pivot]] = matrix[[pivot, rank]]
+        rows = np.nonzero(matrix[:, column])[0]
+        rows = rows[rows != rank]
+        matrix[rows] ^= matrix[rank]
+        rank += 1
+        if rank == matrix.shape[0]:
+            break
+    return matrix[:rank]
+
+class StabilizerCircuit:
+    # Aaronson-Gottesman tableau: rows 0..n-1 are destabilizers, rows
+    # n..2n-1 stabilizers, each stored as X bits, Z bits and a sign bit.
+    # Gates cost O(n) and measurements O(n^2), so Clifford circuits scale to
+    # thousands of qubits.
     def __init__(self, qubits):
-        self.circuit = QuantumCircuit(qubits)
-
-    def add_gate(self, gate, target_qubit):
-        self.circuit.apply_gate(gate, target_qubit)
-
-    def run(self):
-        return self.circuit.measure()
-
-def main():
-    num_qubits = 2
-    simulator = QuantumSimulator(num_qubits)
-
-    # Add gates to the simulator
-    hadamard = HadamardGate()
-    simulator.add_gate(hadamard, 0)  # Apply H to qubit 0
+        self.qubits = qubits
+        self.gates = []
+        self.executed = 0
+        self.x = np.zeros((2 * qubits, qubits), dtype=np.uint8)
+        self.z = np.zeros((2 * qubits, qubits), dtype=np.uint8)
+        self.r = np.zeros(2 * qubits, dtype=np.uint8)
+        self.x[np.arange(qubits), np.arange(qubits)] = 1
+        self.z[qubits + np.arange(qubits), np.arange(qubits)] = 1
+
+    def instruction(self, gate, target_qubit, control_qubit=None):
+        if not isinstance(gate, CLIFFORD_GATES):
+            raise ValueError(f"{type(gate).__name__} is not a supported Clifford gate")
+        return make_instruction(gate, target_qubit, control_qubit, self.qubits)
+
+    def add_gate(self, gate, target_qubit, control_qubit=None):
+        self.gates.append(self.instruction(gate, target_qubit, control_qubit))
+
+    def execute(self):
+        for instruction in self.gates[self.executed:]:
+            self.apply_instruction(instruction)
+        self.executed = len(self.gates)
+
+    def apply_instruction(self, instruction):
+        gate = instruction.gate
+        a = instruction.target_qubit
+        if isinstance(gate, HadamardGate):
+            self.r ^= self.x[:, a] & self.z[:, a]
+            self.x[:, a], self.z[:, a] = self.z[:, a].copy(), self.x[:, a].copy()
+        elif isinstance(gate, PauliXGate):
+            self.r ^= self.z[:, a]
+        elif isinstance(gate, PauliZGate):
+            self.r ^= self.x[:, a]
+        elif isinstance(gate, PauliYGate):
+            self.r ^= self.x[:, a] ^ self.z[:, a]
+        elif isinstance(gate, CNOTGate):
+            c = instruction.control_qubit
+            self.r ^= self.x[:, c] & self.z[:, a] & (self.x[:, a] ^ self.z[:, c] ^ 1)
+            self.x[:, a] ^= self.x[:, c]
+            self.z[:, c] ^= self.z[:, a]
+
+    def copy(self):
+        clone = StabilizerCircuit.__new__(StabilizerCircuit)
+        clone.__dict__.update(self.__dict__)
+        clone.gates = list(self.gates)
+        clone.x = self.x.copy()
+        clone.z = self.z.copy()
+        clone.r = self.r.copy()
+        return clone
+
+    def rowsum(self, targets, source):
+        # Replaces each target row with target * source.
+        exponents = pauli_phase_exponents(self.x[source], self.z[source], self.x[targets], self.z[targets]).sum(axis=1)
+        total = 2 * self.r[targets].astype(np.int64) + 2 * int(self.r[source]) + exponents
+        self.r[targets] = (total % 4) // 2
+        self.x[targets] ^= self.x[source]
+        self.z[targets] ^= self.z[source]
+
+    def product_sign(self, rows):
+        # Sign bit of the ordered product of the given rows. The running
+        # product's Pauli part is a prefix XOR, so every step's phase can
+        # be computed at once.
+        if rows.size == 0:
+            return 0
+        x = self.x[rows]
+        z = self.z[rows]
+        prefix_x = np.bitwise_xor.accumulate(x, axis=0)
+        prefix_z = np.bitwise_xor.accumulate(z, axis=0)
+        exponents = pauli_phase_exponents(x[1:], z[1:], prefix_x[:-1], prefix_z[:-1]).sum()
+        total = 2 * int(self.r[rows].astype(np.int64).sum()) + int(exponents)
+        return (total % 4) // 2
+
+    def measure_qubit(self, qubit, outcome=0):
+        # Collapses the tableau; a random outcome is set to `outcome`.
+        n = self.qubits
+        anticommuting = np.nonzero(self.x[n:, qubit])[0]
+        if anticommuting.size == 0:
+            return self.product_sign(n + np.nonzero(self.x[:n, qubit])[0])
+        p = n + anticommuting[0]
+        others = np.nonzero(self.x[:, qubit])[0]
+        self.rowsum(others[others != p], p)
+        self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+        self.x[p] = 0
+        self.z[p] = 0
+        self.z[p, qubit] = 1
+        self.r[p] = outcome
+        return outcome
+
+    def sample_bits(self, shots):
+        # Z-basis outcomes of a stabilizer state are uniform over an affine
+        # space: one reference outcome plus the GF(2) span of the
+        # stabilizers' X parts.
+        self.execute()
+        reference = self.copy()
+        offset = np.array([reference.measure_qubit(qubit) for qubit in range(self.qubits)], dtype=np.uint8)
+        basis = gf2_row_basis(self.x[self.qubits:])
+        coefficients = np.random.randint(0, 2, size=(shots, len(basis))).astype(np.float32)
+        flips = (coefficients @ basis.astype(np.float32)).astype(np.int64) & 1
+        return (flips ^ offset).astype(np.uint8)
+
+    def sample(self, shots):
+        if self.qubits > 62:
+            raise ValueError("Use sample_bits for more than 62 qubits")
+        return self.sample_bits(shots).astype(np.int64) @ (np.int64(1) << np.arange(self.qubits))
 
-    cnot = CNOTGate()
-    simulator.add_gate(cnot, 1)  # Apply CNOT with control on qubit 0 and target qubit 1
+    def measure(self):
+        bits = self.sample_bits(1)[0]
+        return sum(int(bit) << qubit for qubit, bit in enumerate(bits))
 
-    # Run the simulation
-    result = simulator.run()
-    print(f'Measurement result: {result}')
+    def close(self):
+        pass
 
-if __name__ == "__main__":
-    main()
+class QuantumSimulator:
+    def __init__(self, qubits, workers=1, dtype=None, backend='auto'):
+        # backend is 'statevector', 'stabilizer' or 'auto'. 'auto' starts on
+        # the stabilizer tableau and switches to a statevector the first time
+        # a non-Clifford gate is added. With dtype=None the statevector is
+        # float64 while every gate is real and is promoted to complex128 on
+        # the first complex one.
+        self.workers = workers
+        self.dtype = dtype
+        self.backend = backend
+        if backend == 'statevector':
+            self.circuit = QuantumCircuit(qubits, workers, dtype=dtype or np.float64)
+        else:
+            self.circuit = StabilizerCircuit(qubits)
+
+    def statevector_dtype(self, instructions):
+        if self.dtype is not None:
+            return self.dtype
+        return np.float64 if is_real_circuit(instructions) else np.complex128
+
+    def add_gate(self, gate, target_qubit, control_qubit=None):
+        if isinstance(self.circuit, StabilizerCircuit) and not isinstance(gate, CLIFFORD_GATES) and self.backend == 'auto':
+            pending = self.circuit.gates + [Instruction(gate, target_qubit, control_qubit)]
+            circuit = QuantumCircuit(self.circuit.qubits, self.workers, dtype=self.statevector_dtype(pending))
+            for instruction in self.circuit.gates:
+                circuit.add_gate(instruction.gate, instruction.target_qubit, instruction.control_qubit)
+            self.circuit.close()
+            self.circuit = circuit
+        elif self.dtype is None and isinstance(self.circuit, QuantumCircuit) and not is_real_gate(gate):
+            self.circuit.promote(np.complex128)
+        self.circuit.add_gate(gate, target_qubit, control_qubit)
+
+    def run(self, shots=None):
+        # With shots, returns a dense array of counts per basis state; use
+        # counts() for circuits too wide for that.
+        if shots is None:
+            return self.circuit.measure()
+        if self.circuit.qubits > MAX_COUNT_QUBITS:
+            raise ValueError(f"Dense counts need 2**{self.circuit.qubits} entries; use counts() above "
+                             f"{MAX_COUNT_QUBITS} qubits")
+        samples = self.circuit.sample(shots)
+        return np.bincount(samples, minlength=2**self.circuit.qubits)
+
+    def close(self):
+        # Shuts down the statevector's thread pool when workers > 1.
+        self.circuit.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def counts(self, shots):
+        # Sparse {bitstring: count} for the observed outcomes only, qubit 0
+        # rightmost; works at any width.
+        outcomes, counts = np.unique(self.circuit.sample_bits(shots), axis=0, return_counts=True)
+        return {''.join(map(str, outcome[::-1])): int(count) for outcome, count in zip(outcomes, counts)}
 
 # Simulation of multiple runs
+def bell_state_simulator():
+    simulator = QuantumSimulator(2)
+    simulator.add_gate(HadamardGate(), 0)
+    simulator.add_gate(CNOTGate(), 1, 0)
+    return simulator
+
 def multiple_runs(simulations):
-    results = []
-    for i in range(simulations):
-        num_qubits = 2
-        simulator = QuantumSimulator(num_qubits)
-        hadamard = HadamardGate()
-        simulator.add_gate(hadamard, 0)
-        cnot = CNOTGate()
-        simulator.add_gate(cnot, 1)
-        result = simulator.run()
-        results.append(result)
-    return results
+    return bell_state_simulator().circuit.sample(simulations)
 
 def run_and_collect_data(simulations):
-    results = multiple_runs(simulations)
-    counts = np.bincount(results, minlength=4)
+    counts = bell_state_simulator().run(shots=simulations)
     print("\nSimulation results for {} runs:".format(simulations))
     for i, count in enumerate(counts):
         print(f'Outcome {i}: {count}')
 
-run_and_collect_data(1000)
-
 # Visualization of probabilities
-import matplotlib.pyplot as plt
-
 def plot_probability_distribution(simulations):
-    results = multiple_runs(simulations)
-    counts = np.bincount(results, minlength=4)
+    import matplotlib.pyplot as plt
+
+    counts = bell_state_simulator().run(shots=simulations)
     probabilities = counts / simulations
     
     plt.bar(range(len(probabilities)), probabilities)
@@ -124,12 +532,13 @@ def plot_probability_distribution(simulations):
     plt.title('Outcome Probability Distribution')
     plt.show()
 
-plot_probability_distribution(1000)
-
 # Extended functionality: random quantum circuit generation
-def random_circuit(num_qubits, depth):
-    gates = [HadamardGate(), PauliXGate(), PauliYGate(), PauliZGate(), CNOTGate()]
-    circuit = QuantumCircuit(num_qubits)
+def random_circuit(num_qubits, depth, gates=None, dtype=np.complex128, backend='statevector'):
+    gates = gates or [HadamardGate(), PauliXGate(), PauliYGate(), PauliZGate(), CNOTGate()]
+    if backend == 'stabilizer':
+        circuit = StabilizerCircuit(num_qubits)
+    else:
+        circuit = QuantumCircuit(num_qubits, dtype=dtype)
 
     for _ in range(depth):
         gate = np.random.choice(gates)
@@ -140,64 +549,156 @@ def random_circuit(num_qubits, depth):
         else:
             control_qubit = None
         
-        circuit.apply_gate(gate, target_qubit)
+        circuit.add_gate(gate, target_qubit, control_qubit)
 
     return circuit
 
-random_circuit = random_circuit(3, 5)
-print("Random circuit state: ", random_circuit.state)
-
 # Extended: quantum state visualization
-from qiskit.visualization import plot_histogram
-
 def visualize_circuit(circuit):
     from qiskit import QuantumCircuit
+    from qiskit.quantum_info import Statevector
     from qiskit.visualization import plot_bloch_multivector
 
     qiskit_circuit = QuantumCircuit(circuit.qubits)
-    for gate in circuit.gates:
+    for instruction in circuit.gates:
+        gate = instruction.gate
         if isinstance(gate, HadamardGate):
-            qiskit_circuit.h(0)
+            qiskit_circuit.h(instruction.target_qubit)
         elif isinstance(gate, PauliXGate):
-            qiskit_circuit.x(0)
+            qiskit_circuit.x(instruction.target_qubit)
         elif isinstance(gate, CNOTGate):
-            qiskit_circuit.cx(0, 1)
+            qiskit_circuit.cx(instruction.control_qubit, instruction.target_qubit)
 
-    backend = Aer.get_backend('statevector_simulator')
-    statevector = execute(qiskit_circuit, backend).result().get_statevector()
+    statevector = Statevector.from_instruction(qiskit_circuit)
     plot_bloch_multivector(statevector)
 
-visualize_circuit(random_circuit)
-
 # Save and Load Quantum Circuit to/from a file
-import json
+# Checkpoint layout: magic, little-endian u64 header length, JSON header,
+# zero padding up to a CHECKPOINT_ALIGNMENT boundary, then the raw
+# amplitudes. The aligned data offset lets np.memmap map the state directly.
+# New files pad the JSON with at least CHECKPOINT_HEADER_RESERVE spaces so
+# an 'r+' load can grow the gate history in place.
+CHECKPOINT_MAGIC = b'QSTATE01'
+CHECKPOINT_ALIGNMENT = 4096
+CHECKPOINT_HEADER_RESERVE = 16384
+
+def encode_instruction(instruction):
+    gate = instruction.gate
+    record = {'gate': type(gate).__name__, 'target': instruction.target_qubit, 'control': instruction.control_qubit}
+    if record['gate'] not in GATE_TYPES:
+        matrix = np.asarray(gate.matrix, dtype=np.complex128)
+        record['matrix'] = [matrix.real.tolist(), matrix.imag.tolist()]
+    return record
+
+def decode_instruction(record):
+    if record['gate'] in GATE_TYPES:
+        gate = GATE_TYPES[record['gate']]()
+    else:
+        real, imag = record['matrix']
+        gate = QuantumGate(np.array(real) + 1j * np.array(imag))
+    return Instruction(gate, record['target'], record['control'])
+
+def encode_checkpoint_header(qubits, dtype, gates):
+    return json.dumps({
+        'qubits': qubits,
+        'dtype': dtype.str,
+        'gates': [encode_instruction(instruction) for instruction in gates],
+    }).encode('utf-8')
 
 def save_circuit_to_file(circuit, filename):
-    with open(filename, 'w') as f:
-        json.dump(circuit.state.tolist(), f)
-
-def load_circuit_from_file(filename):
-    with open(filename, 'r') as f:
-        data = json.load(f)
-        loaded_circuit = QuantumCircuit(len(data))
-        loaded_circuit.state = np.array(data)
-        return loaded_circuit
-
-# Example of saving and loading circuit state
-save_circuit_to_file(random_circuit, 'quantum_circuit.json')
-loaded_circuit = load_circuit_from_file('quantum_circuit.json')
-print("Loaded circuit state: ", loaded_circuit.state)
-
-# Performance benchmarking
-def benchmark_simulator(runs=1000):
-    import time
-    start = time.time()
-    for _ in range(runs):
-        simulator = QuantumSimulator(2)
-        simulator.add_gate(HadamardGate(), 0)
-        simulator.add_gate(CNOTGate(), 1)
-        simulator.run()
-    end = time.time()
-    print(f'Benchmarking {} runs took {end - start:.5f} seconds')
-
-benchmark_simulator(1000)
\ No newline at end of file
+    if not isinstance(circuit, QuantumCircuit):
+        raise TypeError(f"Only statevector circuits can be checkpointed, not {type(circuit).__name__}")
+    state = circuit.execute()
+    header = encode_checkpoint_header(circuit.qubits, state.dtype, circuit.gates)
+    prefix_length = len(CHECKPOINT_MAGIC) + 8 + len(header) + CHECKPOINT_HEADER_RESERVE
+    header = header.ljust(len(header) + CHECKPOINT_HEADER_RESERVE + -prefix_length % CHECKPOINT_ALIGNMENT)
+    with open(filename, 'wb') as f:
+        f.write(CHECKPOINT_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        state.tofile(f)
+
+class Checkpoint:
+    # A checkpoint whose amplitudes are memory-mapped 'r+'. The header is
+    # rewritten in place, padded to the space before the data offset, so the
+    # offset never moves; gates whose history wouldn't fit are refused
+    # before they touch the mapped state.
+    def __init__(self, filename, offset):
+        self.filename = filename
+        self.offset = offset
+
+    def encode_header(self, circuit, gates):
+        header = encode_checkpoint_header(circuit.qubits, circuit.dtype, gates)
+        capacity = self.offset - len(CHECKPOINT_MAGIC) - 8
+        if len(header) > capacity:
+            raise ValueError(f"The gate history no longer fits in {self.filename}'s header; "
+                             "save the circuit to a new checkpoint")
+        return header.ljust(capacity)
+
+    def update(self, circuit):
+        header = self.encode_header(circuit, circuit.gates)
+        circuit.state.flush()
+        with open(self.filename, 'r+b') as f:
+            f.seek(len(CHECKPOINT_MAGIC))
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+
+def read_checkpoint_header(filename):
+    with open(filename, 'rb') as f:
+        if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{filename} is not a statevector checkpoint")
+        (header_length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    prefix_length = len(CHECKPOINT_MAGIC) + 8 + header_length
+    header['offset'] = prefix_length + (-prefix_length % CHECKPOINT_ALIGNMENT)
+    return header
+
+def load_circuit_from_file(filename, mmap_mode=None, workers=1):
+    # With mmap_mode ('r', 'r+' or 'c', as for np.memmap) the amplitudes stay
+    # on disk; 'r+' lets a resumed simulation update the checkpoint in place,
+    # header included.
+    header = read_checkpoint_header(filename)
+    dtype = np.dtype(header['dtype'])
+    size = 2**header['qubits']
+    if mmap_mode is None:
+        with open(filename, 'rb') as f:
+            f.seek(header['offset'])
+            state = np.fromfile(f, dtype=dtype, count=size)
+    else:
+        state = np.memmap(filename, dtype=dtype, mode=mmap_mode, offset=header['offset'], shape=(size,))
+    loaded_circuit = QuantumCircuit(header['qubits'], workers, state=state)
+    loaded_circuit.gates = [decode_instruction(record) for record in header['gates']]
+    loaded_circuit.executed = len(loaded_circuit.gates)
+    if mmap_mode == 'r+':
+        loaded_circuit.checkpoint = Checkpoint(filename, header['offset'])
+    return loaded_circuit
+
+def main():
+    num_qubits = 2
+    simulator = QuantumSimulator(num_qubits)
+
+    # Add gates to the simulator
+    hadamard = HadamardGate()
+    simulator.add_gate(hadamard, 0)  # Apply H to qubit 0
+
+    cnot = CNOTGate()
+    simulator.add_gate(cnot, 1, 0)  # Apply CNOT with control on qubit 0 and target qubit 1
+
+    # Run the simulation
+    result = simulator.run()
+    print(f'Measurement result: {result}')
+
+    run_and_collect_data(1000)
+    plot_probability_distribution(1000)
+
+    circuit = random_circuit(3, 5)
+    print("Random circuit state: ", circuit.execute())
+    visualize_circuit(circuit)
+
+    # Example of saving and loading circuit state
+    save_circuit_to_file(circuit, 'quantum_circuit.qstate')
+    loaded_circuit = load_circuit_from_file('quantum_circuit.qstate')
+    print("Loaded circuit state: ", loaded_circuit.state)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,97 @@
-import speech_recognition as sr
-import pyttsx3
 import datetime
 import webbrowser
 import os
 import random
+import re
 import sys
 
+WORD = re.compile(r"[\w']+")
+
+def words_of(text):
+    return WORD.findall(text.lower())
+
+class CommandDispatcher:
+    # Word-level Aho-Corasick automaton over the registered phrases. One pass
+    # over the utterance's words finds every phrase it contains; the longest
+    # one wins, ties going to the phrase registered first. Registration marks
+    # the automaton stale and it is rebuilt on the next match.
+    def __init__(self, commands=None):
+        self.phrases = {}
+        self.stale = True
+        self.transitions = []
+        self.fail = []
+        self.best = []
+        if commands:
+            self.register_all(commands)
+
+    def register(self, phrase, handler):
+        words = tuple(words_of(phrase))
+        if not words:
+            raise ValueError("Command phrase must contain at least one word")
+        self.phrases.pop(words, None)
+        self.phrases[words] = (phrase, handler)
+        self.stale = True
+
+    def register_all(self, commands):
+        for phrase, handler in commands.items():
+            self.register(phrase, handler)
+
+    def unregister(self, phrase):
+        if self.phrases.pop(tuple(words_of(phrase)), None) is not None:
+            self.stale = True
+
+    def build(self):
+        # best[node] holds the winning phrase ending at node or at any of
+        # its failure-chain suffixes, as (-length, order, phrase, handler).
+        self.transitions = [{}]
+        self.best = [None]
+        for order, (words, (phrase, handler)) in enumerate(self.phrases.items()):
+            node = 0
+            for word in words:
+                next_node = self.transitions[node].get(word)
+                if next_node is None:
+                    next_node = len(self.transitions)
+                    self.transitions[node][word] = next_node
+                    self.transitions.append({})
+                    self.best.append(None)
+                node = next_node
+            self.best[node] = (-len(words), order, phrase, handler)
+        self.fail = [0] * len(self.transitions)
+        queue = list(self.transitions[0].values())
+        for node in queue:
+            for word, child in self.transitions[node].items():
+                if node:
+                    state = self.fail[node]
+                    while state and word not in self.transitions[state]:
+                        state = self.fail[state]
+                    self.fail[child] = self.transitions[state].get(word, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+                queue.append(child)
+        self.stale = False
+
+    def match(self, utterance):
+        if self.stale:
+            self.build()
+        transitions, fail, best = self.transitions, self.fail, self.best
+        state = 0
+        found = None
+        for word in words_of(utterance):
+            while state and word not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(word, 0)
+            candidate = best[state]
+            if candidate is not None and (found is None or candidate < found):
+                found = candidate
+        if found is None:
+            return None
+        return found[2], found[3]
+
 class VoiceAssistant:
     def __init__(self):
+        import speech_recognition as sr
+        import pyttsx3
         self.recognizer = sr.Recognizer()
         self.engine = pyttsx3.init()
         self.commands = {
@@ -19,6 +103,16 @@ class VoiceAssistant:
             "play music": self.play_music,
             "stop": self.stop,
         }
+        self.dispatcher = CommandDispatcher(self.commands)
+
+    def register_command(self, phrase, handler):
+        self.commands[phrase] = handler
+        self.dispatcher.register(phrase, handler)
+
+    def register_plugin(self, plugin):
+        # A plugin is any object whose commands() returns phrase -> handler.
+        for phrase, handler in plugin.commands().items():
+            self.register_command(phrase, handler)
 
     def speak(self, text):
         print("Assistant: " + text)
@@ -26,6 +120,7 @@ class VoiceAssistant:
         self.engine.runAndWait()
 
     def listen(self):
+        import speech_recognition as sr
         with sr.Microphone() as source:
             print("Listening...")
             audio = self.recognizer.listen(source)
@@ -42,10 +137,10 @@ class VoiceAssistant:
                 return None
 
     def execute_command(self, command):
-        for key in self.commands.keys():
-            if key in command:
-                self.commands[key]()
-                return
+        match = self.dispatcher.match(command)
+        if match is not None:
+            match[1]()
+            return
         self.speak("I can only respond to certain commands.")
 
     def respond_name(self):